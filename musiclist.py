@@ -7,9 +7,11 @@
 
 import os
 import sys
+import json
 import argparse
 from musicmod import createlist
 from musicmod import viewlist
+from musicmod import progress
 
 
 def is_dir(string):
@@ -24,23 +26,137 @@ def is_dir(string):
     return
 
 
+def is_positive(string):
+    try:
+        number = int(string)
+    except ValueError:
+        number = 0
+    if number < 1:
+        print('Error, \'' + string + '\' is not a positive number')
+        sys.exit(1)
+    return number
+
+
+MIN_DEPTH = 2  # Minimum directory levels read: artist and album
+
+
+def is_depth(string):
+    try:
+        number = int(string)
+    except ValueError:
+        number = 0
+    if number < MIN_DEPTH:
+        print('Error, \'' + string + '\' is not a valid depth, the minimum is ' + str(MIN_DEPTH) + ' (artist and album)')
+        sys.exit(1)
+    return number
+
+
+CONFIG_TYPES = {'extensions': list, 'include': list, 'exclude': list,
+                'skip_hidden': bool, 'min_size': int,
+                'max_depth': int, 'merge_discs': bool, 'loose_name': str,
+                'progress': bool, 'progress_rate': int, 'metrics': str,
+                'sort': str}  # Type of every option of the configuration file
+
+
+def check_config(config):
+    """
+    Check the options of a configuration file.
+    Raise ValueError if an option is unknown or has a wrong type.
+    """
+    if not isinstance(config, dict):
+        raise ValueError('it must be a JSON object')
+    for key, value in config.items():
+        if key not in CONFIG_TYPES:
+            raise ValueError('unknown option "' + key + '"')
+        kind = CONFIG_TYPES[key]
+        # bool is a subclass of int, so it is rejected for the numbers
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ValueError('option "' + key + '" must be of type ' + kind.__name__)
+        if kind is list and not all(isinstance(item, str) for item in value):
+            raise ValueError('option "' + key + '" must be a list of strings')
+        if key == 'max_depth' and value < MIN_DEPTH:
+            raise ValueError('option "max_depth" must be at least ' + str(MIN_DEPTH))
+    return
+
+
+def read_config(config_name):
+    """
+    Read the options of a JSON configuration file.
+    Example of configuration file:
+      {
+          "extensions": ["mp3", "m4a", "flac"],
+          "include": ["*"],
+          "exclude": ["*(live)*"],
+          "skip_hidden": true,
+          "min_size": 1024,
+          "max_depth": 4,
+          "merge_discs": true,
+          "loose_name": "(loose)",
+          "progress": true,
+          "progress_rate": 4,
+          "metrics": "/var/lib/node_exporter/musiclist.prom",
+          "sort": "natural"
+      }
+    """
+    if not config_name:
+        return {}
+    if not os.path.isfile(config_name):
+        print('Error, configuration file \'' + config_name + '\' does not exist')
+        sys.exit(1)
+    try:
+        with open(config_name, 'r', encoding='utf-8') as config_file:
+            config = json.load(config_file)
+        check_config(config)
+    except ValueError as e:
+        print('Error, configuration file \'' + config_name + '\' is not valid: ' + str(e))
+        sys.exit(1)
+    return config
+
+
 def main():
     # Make a list of command line arguments, omitting the [0] element
     # which is the script itself.
     args = sys.argv[1:]
     if not args:
         print('\nusage: musiclist.py [-h] [--path MUSIC_DIR] [-p]\n' + \
+              '                    [--config CONFIG_NAME] [--ext EXTENSIONS]\n' + \
+              '                    [--include PATTERN] [--exclude PATTERN]\n' + \
+              '                    [--skip-hidden] [--min-size BYTES]\n' + \
+              '                    [--max-depth N] [--no-disc-merge] [--loose-name NAME]\n' + \
+              '                    [--progress] [--progress-rate N] [--metrics METRICS_NAME]\n' + \
+              '                    [--sort {plain,casefold,natural,locale}]\n' + \
+              '                    [--dbload DB_LOAD | --csvload CSV_LOAD |\n' + \
+              '                     --snapshotload SNAPSHOT_LOAD]\n' + \
               '                    [-f FILE_NAME] [-d DB_NAME] [-c CSV_NAME]\n' + \
               '                    [-j JSON_NAME] [-j2 JSON_NAME]\n' + \
               '                    [-x XML_NAME] [-x2 XML_NAME]\n' + \
               '                    [--html HTML_NAME]\n' + \
+              '                    [--site SITE_DIR] [--site-albums] [--workers N]\n' + \
+              '                    [-s SNAPSHOT_NAME]\n' + \
               '                    [--dbview DB_VIEW] [--csvview CSV_VIEW]\n' + \
               '                    [--jsonview JSON_VIEW] [--xmlview XML_VIEW]\n' + \
-              '                    [--htmlview HTML_VIEW]')
+              '                    [--htmlview HTML_VIEW] [--snapshotview SNAPSHOT_VIEW]')
         return
 
     parser = argparse.ArgumentParser(description='Manage music list')
     parser.add_argument('--path', type=is_dir, action='store', default='', dest="music_dir", help='directory where the music is')
+    parser.add_argument('--config', action='store', dest="config_name", help='read the options from a JSON configuration file')
+    parser.add_argument('--ext', action='store', dest="extensions", help='extensions of the tracks, separated by commas (default: MP3, M4A, FLAC, OGG, ...)')
+    parser.add_argument('--include', action='append', dest="include", help='only read the tracks that match a pattern (can be repeated)')
+    parser.add_argument('--exclude', action='append', dest="exclude", help='skip the tracks that match a pattern (can be repeated)')
+    parser.add_argument('--skip-hidden', action='store_true', default=None, dest='skip_hidden', help='skip hidden files and directories')
+    parser.add_argument('--min-size', type=int, action='store', dest="min_size", help='minimum size of a track in bytes')
+    parser.add_argument('--max-depth', type=is_depth, action='store', dest="max_depth", help='directory levels read below the music directory, at least 2 (default: 4)')
+    parser.add_argument('--no-disc-merge', action='store_false', default=None, dest='merge_discs', help='do not merge the disc folders (CD1, Disc 2...) into their album')
+    parser.add_argument('--loose-name', action='store', dest="loose_name", help='album of the tracks outside an album folder (default: "(loose)")')
+    parser.add_argument('--progress', action='store_true', default=None, dest='progress', help='show the progress of the scan and the exports')
+    parser.add_argument('--progress-rate', type=int, action='store', dest="progress_rate", help='maximum number of progress updates per second (default: 4)')
+    parser.add_argument('--metrics', action='store', dest="metrics_name", help='write the progress counters to a Prometheus textfile')
+    parser.add_argument('--sort', choices=createlist.COLLATIONS, action='store', dest="sort", help='sort order of the artists, albums and tracks (default: plain)')
+    load_group = parser.add_mutually_exclusive_group()
+    load_group.add_argument('--dbload', action='store', dest="db_load", help='load music list from a SQLite Database instead of the directory')
+    load_group.add_argument('--csvload', action='store', dest="csv_load", help='load music list from a CSV file instead of the directory')
+    load_group.add_argument('--snapshotload', action='store', dest="snapshot_load", help='load music list from a binary snapshot file instead of the directory')
     parser.add_argument('-p', '--print', action='store_true', default=False, dest='printlist', help='print music list')
     parser.add_argument('-f', '--file', action='store', dest="file_name", help='write music list to a text file')
     parser.add_argument('-d', '--db', action='store', dest="db_name", help='write music list to SQLite Database')
@@ -50,20 +166,56 @@ def main():
     parser.add_argument('-x', '--xml', action='store', dest="xml_name", help='write music list (music list) to an XML file')
     parser.add_argument('-x2', '--xml2', action='store', dest="xml_name2", help='write music list (tracks list) to an XML file')
     parser.add_argument('--html', action='store', dest="html_name", help='write music list to an HTML file')
+    parser.add_argument('--site', action='store', dest="site_dir", help='write music list to a static HTML site')
+    parser.add_argument('--site-albums', action='store_true', default=False, dest='site_albums', help='write one page per album in the HTML site')
+    parser.add_argument('--workers', type=is_positive, action='store', dest="workers", help='number of worker processes for the HTML site')
+    parser.add_argument('-s', '--snapshot', action='store', dest="snapshot_name", help='write music list to a binary snapshot file')
     parser.add_argument('--dbview', action='store', dest="db_view", help='view music list from a SQLite Database')
     parser.add_argument('--csvview', action='store', dest="csv_view", help='view music list from a CSV file')
     parser.add_argument('--jsonview', action='store', dest="json_view", help='view music list from a JSON file')
     parser.add_argument('--xmlview', action='store', dest="xml_view", help='view music list from an XML file')
     parser.add_argument('--htmlview', action='store', dest="html_view", help='view music list from an HTML file')
+    parser.add_argument('--snapshotview', action='store', dest="snapshot_view", help='view music list from a binary snapshot file')
 
     args = parser.parse_args()
+    config = read_config(args.config_name)
+
+    # Set the rules that select the tracks, the command line overrides the configuration file
+    extensions = args.extensions.split(',') if args.extensions else config.get('extensions')
+    createlist.set_track_filter(extensions,
+                                args.include or config.get('include'),
+                                args.exclude or config.get('exclude'),
+                                args.skip_hidden or config.get('skip_hidden', False),
+                                args.min_size if args.min_size is not None else config.get('min_size', 0))
+    createlist.set_layout(args.max_depth if args.max_depth is not None else config.get('max_depth', 4),
+                          args.merge_discs if args.merge_discs is not None else config.get('merge_discs', True),
+                          args.loose_name or config.get('loose_name', '(loose)'))
+    sort = args.sort or config.get('sort', 'plain')
+    if sort not in createlist.COLLATIONS:
+        print('Error, sort order \'' + sort + '\' does not exist')
+        sys.exit(1)
+    createlist.set_collation(sort)
+    progress.configure(args.progress or config.get('progress', False),
+                       args.progress_rate or config.get('progress_rate', 4),
+                       args.metrics_name or config.get('metrics'))
 
     # Load music information from the directory
     if args.printlist or args.file_name  or args.db_name or args.csv_name or \
            args.json_name or args.json_name2 or \
            args.xml_name or args.xml_name2 or \
-           args.html_name:
-        createlist.load_music_list(args.music_dir)
+           args.html_name or args.site_dir or args.snapshot_name:
+        # Stop if the music list can not be loaded, so no file is replaced with an empty list
+        if args.db_load:
+            if not createlist.load_db_list(args.db_load):
+                sys.exit(1)
+        elif args.csv_load:
+            if not createlist.load_csv_list(args.csv_load):
+                sys.exit(1)
+        elif args.snapshot_load:
+            if not createlist.load_snapshot_list(args.snapshot_load):
+                sys.exit(1)
+        else:
+            createlist.load_music_list(args.music_dir)
 
     # Execute options
     if args.printlist:
@@ -84,6 +236,10 @@ def main():
         createlist.xml_list_tracks(args.xml_name2)
     if args.html_name:
         createlist.html_list(args.html_name)
+    if args.site_dir:
+        createlist.site_list(args.site_dir, args.site_albums, args.workers)
+    if args.snapshot_name:
+        createlist.snapshot_list(args.snapshot_name)
     if args.db_view:
         viewlist.db_list(args.db_view)
     if args.csv_view:
@@ -94,6 +250,8 @@ def main():
         viewlist.xml_list(args.xml_view)
     if args.html_view:
         viewlist.html_list(args.html_view)
+    if args.snapshot_view:
+        viewlist.snapshot_list(args.snapshot_view)
 
     return
 
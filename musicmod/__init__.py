@@ -1,3 +1,3 @@
 # __init__.py
  
-__all__ = ['createlist', 'viewlist']
\ No newline at end of file
+__all__ = ['createlist', 'viewlist', 'snapshot', 'progress']
\ No newline at end of file
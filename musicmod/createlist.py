@@ -10,10 +10,177 @@ import locale
 import sqlite3
 import csv
 import json
+import re
+import fnmatch
+import hashlib
+import unicodedata
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from musicmod import snapshot
+from musicmod import progress
 
-EXT_LIST = ['.MP3', '.M4A']  # List of extensions allowed (in upper case): MP3, ACC
+EXT_LIST = ['.MP3', '.M4A', '.AAC', '.FLAC', '.OGG', '.OPUS',
+            '.WAV', '.AIFF', '.WMA', '.APE', '.WV']  # Extensions allowed by default (in upper case)
+track_filter = None          # Matcher of the tracks, compiled by 'set_track_filter'
+track_rules = {'skip_hidden': False}  # Rules of the tracks, set by 'set_track_filter'
+layout = {'max_depth': 4,             # Directory levels read below the music directory
+          'merge_discs': True,        # Merge the disc folders (CD1, Disc 2...) into their album
+          'loose_name': '(loose)'}    # Album of the tracks outside an album folder
+DISC_RE = re.compile(r'^(cd|dis[ck])[\s._-]*\d+$', re.IGNORECASE)  # Names of the disc folders
 dict_artists = {}            # Music information loaded in memory
+COLLATIONS = ['plain', 'casefold', 'natural', 'locale']  # Sort orders of the names
+collation = 'plain'          # Sort order used by the exporters, set by 'set_collation'
+sort_keys = {}               # Sort key of every name, computed once per name
+ordered_music = None         # Sorted view of 'dict_artists', built by 'music_view'
+NUMBER_RE = re.compile(r'(\d+)')  # Numbers in a name, for the natural sort order
+WRITE_LINES = 4096           # Lines written at once in a text file
+WRITE_CHARS = 1024 * 1024    # Characters written at once in a JSON file
+SITE_VERSION = 1             # Version of the static site layout, a change forces a full rebuild
+
+
+def compile_track_filter(extensions=None, include=None, exclude=None, skip_hidden=False, min_size=0):
+    """
+    Compile the rules that select the tracks in a matcher function.
+    - extensions: extensions allowed, with or without dot, in any case (default 'EXT_LIST')
+    - include: glob patterns, a track must match one of them (default all)
+    - exclude: glob patterns, a track must not match any of them
+    - skip_hidden: skip the files and directories starting with '.'
+    - min_size: minimum size of a track in bytes
+    Patterns are matched with the file name and ignore the case.
+    The matcher receives an 'os.DirEntry' and returns True if it is a track.
+    The extensions are a set and the patterns are joined in one regular expression,
+    so the cost of a file does not grow with the number of rules.
+    """
+    if extensions is None:
+        extensions = EXT_LIST
+    ext_set = frozenset('.' + ext.lstrip('.').upper() for ext in extensions)
+    include_re = re.compile('|'.join(fnmatch.translate(p) for p in include), re.IGNORECASE) if include else None
+    exclude_re = re.compile('|'.join(fnmatch.translate(p) for p in exclude), re.IGNORECASE) if exclude else None
+
+    def matcher(entry):
+        name = entry.name
+        if skip_hidden and name[0] == '.':
+            return False
+        dot = name.rfind('.')
+        if dot <= 0 or name[dot:].upper() not in ext_set:
+            return False
+        if include_re is not None and include_re.match(name) is None:
+            return False
+        if exclude_re is not None and exclude_re.match(name) is not None:
+            return False
+        if min_size and entry.stat().st_size < min_size:
+            return False
+        return True
+
+    return matcher
+
+
+def set_track_filter(extensions=None, include=None, exclude=None, skip_hidden=False, min_size=0):
+    """
+    Set the rules that select the tracks used by 'load_music_list'.
+    See 'compile_track_filter'.
+    """
+    global track_filter, track_rules
+
+    track_rules = {'extensions': extensions, 'include': include, 'exclude': exclude,
+                   'skip_hidden': skip_hidden, 'min_size': min_size}
+    track_filter = compile_track_filter(extensions, include, exclude, skip_hidden, min_size)
+
+    return
+
+
+def set_layout(max_depth=4, merge_discs=True, loose_name='(loose)'):
+    """
+    Set the rules of the directory layout used by 'load_music_list'.
+    - max_depth: directory levels read below the music directory (artist is 1, album is 2),
+      at least 2
+    - merge_discs: merge the tracks of the disc folders (CD1, Disc 2...) into their album
+    - loose_name: album of the tracks found in an artist folder, and artist and album
+      of the tracks found in the music directory
+    """
+    global layout
+
+    if max_depth < 2:
+        raise ValueError('Maximum depth must be at least 2 (artist and album)')
+    layout = {'max_depth': max_depth, 'merge_discs': merge_discs, 'loose_name': loose_name}
+
+    return
+
+
+def set_collation(name='plain'):
+    """
+    Set the sort order of the artists, albums and tracks used by the exporters:
+    - plain: Unicode code points ('B' before 'a', 'Track 10' before 'Track 2')
+    - casefold: ignore the case
+    - natural: ignore the case and sort the numbers by value ('Track 2' before 'Track 10')
+    - locale: collation rules of the current locale (accents)
+    """
+    global collation, ordered_music
+
+    if name not in COLLATIONS:
+        raise ValueError('Unknown sort order: ' + name)
+    if name == 'locale':
+        try:
+            locale.setlocale(locale.LC_COLLATE, '')
+        except locale.Error:
+            print('Locale is not supported, using the default collation rules')
+    collation = name
+    sort_keys.clear()
+    ordered_music = None
+
+    return
+
+
+def sort_key(name):
+    """
+    Return the sort key of a name for the current sort order.
+    The keys are cached, so every name is converted only once.
+    The name itself is the last part of the key, so equal keys keep a stable order.
+    """
+    key = sort_keys.get(name)
+    if key is None:
+        if collation == 'casefold':
+            key = (name.casefold(), name)
+        elif collation == 'natural':
+            # Text and numbers alternate, so the parts in the same position are of the same type
+            parts = NUMBER_RE.split(name.casefold())
+            parts[1::2] = [int(number) for number in parts[1::2]]
+            key = (parts, name)
+        elif collation == 'locale':
+            key = (locale.strxfrm(name), name)
+        else:
+            key = name
+        sort_keys[name] = key
+    return key
+
+
+def music_view():
+    """
+    Return 'dict_artists' sorted with the current sort order, as a list shared by all the exporters:
+      [('artist-1', [('album-1_1', ['track-1_1_1', 'track-1_1_2']),
+                     ('album-1_2', ['track-1_2_1'])]),
+       ('artist-2', [('album-2_1', ['track-2_1_1'])])]
+    It is sorted only once, until the music list is loaded again or the sort order changes.
+    """
+    global ordered_music
+
+    if ordered_music is None:
+        ordered_music = [(k_artist, [(k_album, sorted(dict_artists[k_artist][k_album], key=sort_key))
+                                     for k_album in sorted(dict_artists[k_artist].keys(), key=sort_key)])
+                         for k_artist in sorted(dict_artists.keys(), key=sort_key)]
+    return ordered_music
+
+
+def clear_music_list():
+    """
+    Clear the music list in memory 'dict_artists' and its sorted view.
+    """
+    global ordered_music
+
+    dict_artists.clear()
+    ordered_music = None
+
+    return
 
 
 def load_music_list(music_dir):
@@ -44,6 +211,25 @@ def load_music_list(music_dir):
               ├── track_3_1_1
               └── track_3_1_2
 
+    Irregular layouts are also read (see 'set_layout'):
+      music/
+      ├── track_0                   Artist and album '(loose)'
+      └── artist_4/
+          ├── track_4_0             Album '(loose)'
+          ├── album_4_1/
+          │   ├── CD1/
+          │   │   └── track_4_1_1   Album 'album_4_1', track 'CD1/track_4_1_1'
+          │   └── CD2/
+          │       └── track_4_1_2   Album 'album_4_1', track 'CD2/track_4_1_2'
+          └── album_4_2/
+              └── bonus/
+                  └── track_4_2_1   Album 'album_4_2 / bonus'
+
+    The directories are read with a loop and a stack, without recursion,
+    and a directory that is one of its own parents (same st_dev and st_ino)
+    is not read again, so symbolic links that make a loop are skipped.
+    A directory linked in several places is read in each of them.
+
     Example of the structure created in memory:
       dict_artists = 
         {'artist-1': {'album-1_1': ['track-1_1_1', 'track-1_1_2', 'track-1_1_3'] ,
@@ -56,41 +242,201 @@ def load_music_list(music_dir):
 
     global dict_artists
 
+    matcher = track_filter or compile_track_filter()
+    skip_hidden = track_rules['skip_hidden']
+    max_depth = layout['max_depth']
+    merge_discs = layout['merge_discs']
+    loose_name = layout['loose_name']
+
     print('Loading music information from "' + music_dir + '"...')
-    dict_artists.clear()
-    # Artists loop starts, filter only directories
-    artists = filter(lambda x: os.path.isdir(os.path.join(music_dir, x)), os.listdir(music_dir))
-    for artist in artists:
-        dict_albums = {}
-        artist_dir = music_dir + os.sep + artist
-        # Albums loop starts, filter only directories
-        albums = filter(lambda x: os.path.isdir(os.path.join(artist_dir, x)), os.listdir(artist_dir))
-        for album in albums:
-            album_dir = artist_dir + os.sep + album
-            list_tracks = []
-            # Tracks loop starts, filter only files
-            tracks = filter(lambda x: os.path.isfile(os.path.join(album_dir, x)), os.listdir(album_dir))
-            for track in tracks:
-                fileext = os.path.splitext(track)[1].upper()
-                if fileext in EXT_LIST:
-                    list_tracks.append(track)
-            # Tracks loop ends    
-            dict_albums[album] = list_tracks
-            dict_artists[artist] = dict_albums
-        # Albums loop ends
-    # Artists loop ends
+    progress.start('scan')
+    clear_music_list()
+    st = os.stat(music_dir)
+    # Stack of directories to read: path, depth, artist, album, prefix of the tracks,
+    # and identity (st_dev, st_ino) of the directory and its parents
+    stack = [(music_dir, 0, None, None, '', ((st.st_dev, st.st_ino),))]
+    while stack:
+        dir_path, depth, k_artist, k_album, prefix, parents = stack.pop()
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError as e:
+            print('Error reading directory "' + dir_path + '": ' + e.strerror)
+            continue
+        n_files = 0
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir():
+                # Directories loop, filter hidden, too deep and looping directories
+                if (skip_hidden and name[0] == '.') or depth >= max_depth:
+                    continue
+                # os.stat and not entry.stat, which has no st_dev and st_ino on Windows
+                try:
+                    st = os.stat(entry.path)
+                except OSError:
+                    continue
+                identity = (st.st_dev, st.st_ino)
+                if identity in parents:
+                    print('Skipping directory "' + entry.path + '": it makes a loop')
+                    continue
+                parents_entry = parents + (identity,)
+                if depth == 0:
+                    stack.append((entry.path, 1, name, None, '', parents_entry))
+                elif depth == 1:
+                    dict_artists.setdefault(k_artist, {}).setdefault(name, [])
+                    stack.append((entry.path, 2, k_artist, name, '', parents_entry))
+                elif merge_discs and DISC_RE.match(name):
+                    stack.append((entry.path, depth + 1, k_artist, k_album, prefix + name + '/', parents_entry))
+                else:
+                    stack.append((entry.path, depth + 1, k_artist, k_album + ' / ' + name, '', parents_entry))
+            elif entry.is_file():
+                n_files += 1
+                if not matcher(entry):
+                    continue
+                # Tracks, outside an album folder they go to the loose album
+                if depth == 0:
+                    list_tracks = dict_artists.setdefault(loose_name, {}).setdefault(loose_name, [])
+                elif depth == 1:
+                    list_tracks = dict_artists.setdefault(k_artist, {}).setdefault(loose_name, [])
+                else:
+                    list_tracks = dict_artists.setdefault(k_artist, {}).setdefault(k_album, [])
+                list_tracks.append(prefix + name)
+        progress.add(dirs=1, files=n_files)
+    progress.finish()
     print('Music information loaded')
     
     return
 
 
+def load_csv_list(csv_name):
+    """
+    Load the music list in memory 'dict_artists' from a CSV file
+    created by 'csv_list', instead of reading the music directory.
+    CSV format: artist, album, track
+    The file has one row per track, so the albums without tracks found by
+    'load_music_list' are not in the file and are not loaded.
+    Return False if the file does not exist or is not valid.
+    """
+    global dict_artists
+
+    print('Loading music information from CSV file "' + csv_name + '"...')
+    clear_music_list()
+    if not os.path.exists(csv_name):
+        print('CSV file does not exist')
+        return False
+
+    # The file is sorted by artist and album, so the last album is usually
+    # the one of the next row and the repeated names are read only once
+    names = {}
+    last_artist = last_album = None
+    list_tracks = None
+    try:
+        with open(csv_name, 'r', encoding='utf-8', newline='', buffering=1024 * 1024) as csvfile:
+            for row in csv.reader(csvfile):
+                k_artist, k_album, track = row[0], row[1], row[2]
+                if k_artist != last_artist or k_album != last_album:
+                    k_artist = names.setdefault(k_artist, k_artist)
+                    k_album = names.setdefault(k_album, k_album)
+                    list_tracks = dict_artists.setdefault(k_artist, {}).setdefault(k_album, [])
+                    last_artist, last_album = k_artist, k_album
+                list_tracks.append(track)
+    except (IndexError, csv.Error, UnicodeDecodeError):
+        clear_music_list()
+        print('CSV file does not match a CSV music file')
+        return False
+    print('Music information loaded')
+
+    return True
+
+
+def load_db_list(db_name):
+    """
+    Load the music list in memory 'dict_artists' from a SQLite database
+    created by 'db_list', instead of reading the music directory.
+    Table format: artist text, album text, track text
+    The file has one row per track, so the albums without tracks found by
+    'load_music_list' are not in the file and are not loaded.
+    Return False if the file does not exist or is not valid.
+    """
+    global dict_artists
+
+    print('Loading music information from Database "' + db_name + '"...')
+    clear_music_list()
+    if not os.path.exists(db_name):
+        print('Database does not exist')
+        return False
+
+    conn = sqlite3.connect(db_name)
+    try:
+        c = conn.cursor()
+        c.execute('PRAGMA encoding = "UTF-8";')
+
+        # Rows are read in batches, in the order of the index 'idx_music'
+        c.execute("SELECT artist, album, track FROM music ORDER BY artist, album")
+        last_artist = last_album = None
+        list_tracks = None
+        rows = c.fetchmany(10000)
+        while rows:
+            for k_artist, k_album, track in rows:
+                if k_artist != last_artist or k_album != last_album:
+                    list_tracks = dict_artists.setdefault(k_artist, {}).setdefault(k_album, [])
+                    last_artist, last_album = k_artist, k_album
+                list_tracks.append(track)
+            rows = c.fetchmany(10000)
+    except sqlite3.DatabaseError:
+        clear_music_list()
+        print('Database does not match a music Database')
+        return False
+    finally:
+        conn.close()
+    print('Music information loaded')
+
+    return True
+
+
+def load_snapshot_list(snap_name):
+    """
+    Load the music list in memory 'dict_artists' from a binary snapshot file
+    created by 'snapshot_list', instead of reading the music directory.
+    Return False if the file does not exist or is not valid.
+    """
+    global dict_artists
+
+    print('Loading music information from snapshot file "' + snap_name + '"...')
+    clear_music_list()
+    if not os.path.exists(snap_name):
+        print('Snapshot file does not exist')
+        return False
+
+    try:
+        with snapshot.MusicSnapshot(snap_name) as snap:
+            dict_artists.update(snap.to_dict())
+    except ValueError as e:
+        clear_music_list()
+        print('Snapshot file does not match a music snapshot file: ' + str(e))
+        return False
+    print('Music information loaded')
+
+    return True
+
+
+def count_tracks():
+    """
+    Return the number of tracks in 'dict_artists'.
+    """
+    global dict_artists
+
+    return sum(len(list_tracks) for dict_albums in dict_artists.values() for list_tracks in dict_albums.values())
+
+
 def write_file(file_name, data):
     """
     Create and write a text file.
     """
     f = open(file_name, 'w', encoding='utf-8')
-    for item in data:
-        f.write(item + '\n')
+    out = progress.output(f)
+    # Lines are written in blocks, so the progress is counted once per block
+    for i in range(0, len(data), WRITE_LINES):
+        out.write('\n'.join(data[i:i + WRITE_LINES]) + '\n')
     f.close()
     return
 
@@ -100,7 +446,11 @@ def write_json_file(json_name, data):
     Create and write an JSON file.
     """
     with open(json_name, 'w', encoding='utf-8') as json_file:  
-        json.dump(data, json_file, indent=2, sort_keys=True)
+        # json.dump writes every token on its own, the text is written in blocks instead
+        text = json.dumps(data, indent=2, sort_keys=True)
+        out = progress.output(json_file)
+        for i in range(0, len(text), WRITE_CHARS):
+            out.write(text[i:i + WRITE_CHARS])
     return
 
 
@@ -109,7 +459,8 @@ def write_xml_file(xml_name, data):
     Create and write an XML file.
     """
     tree = ET.ElementTree(data)
-    tree.write(xml_name, xml_declaration=True, encoding='utf-8')
+    with open(xml_name, 'wb') as f:
+        tree.write(progress.output(f), xml_declaration=True, encoding='utf-8')
     return
 
 
@@ -120,7 +471,7 @@ def write_html_file(html_name, data):
     with open(html_name, 'wb') as f:
         f.write('<!doctype html>'.encode('utf8'))
         tree = ET.ElementTree(data)
-        tree.write(f, 'utf-8')
+        tree.write(progress.output(f), 'utf-8')
     return
 
 
@@ -132,12 +483,12 @@ def print_list():
 
     print('\nMUSIC LIST')
     print('----------')
-    for k_artist in sorted(dict_artists.keys()):
-        for  k_album in sorted(dict_artists[k_artist].keys()):
+    for k_artist, artist_albums in music_view():
+        for k_album, album_tracks in artist_albums:
             print('ARTIST: ', k_artist.encode('utf-8').decode(sys.stdout.encoding))
             print('ALBUM: ', k_album.encode('utf-8').decode(sys.stdout.encoding))
             print('TRACKS:')
-            for track in sorted(dict_artists[k_artist][k_album]):
+            for track in album_tracks:
                 print('    ', track.encode('utf-8').decode(sys.stdout.encoding))
             print('')
 
@@ -152,18 +503,21 @@ def file_list(file_name):
     output = []
 
     print('Creating file "' + file_name + '"...')
+    progress.start('file', count_tracks())
     output.append("MUSIC LIST")
     output.append('----------\n')
-    for k_artist in sorted(dict_artists.keys()):
-        for  k_album in sorted(dict_artists[k_artist].keys()):
+    for k_artist, artist_albums in music_view():
+        for k_album, album_tracks in artist_albums:
             output.append('ARTIST: ' + k_artist)
             output.append('ALBUM: ' + k_album)
             output.append('TRACKS:')
-            for track in sorted(dict_artists[k_artist][k_album]):
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 output.append("        " + track)
             output.append("")
 
     write_file(file_name, output)
+    progress.finish(progress.file_size(file_name))
     print('File created')
 
     return
@@ -177,6 +531,7 @@ def db_list(db_name):
     global dict_artists
 
     print('Creating Database "' + db_name + '"...')
+    progress.start('db', count_tracks())
     
     # if DB exists then remove 
     if os.path.exists(db_name):
@@ -196,9 +551,10 @@ def db_list(db_name):
                 ON music (artist, album)''')
 
     # Insert rows of data
-    for k_artist in sorted(dict_artists.keys()):
-        for  k_album in sorted(dict_artists[k_artist].keys()):
-            for track in sorted(dict_artists[k_artist][k_album]):
+    for k_artist, artist_albums in music_view():
+        for k_album, album_tracks in artist_albums:
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 row = [k_artist, k_album, track]
                 c.execute("INSERT INTO music VALUES (?, ?, ?)", row)
     
@@ -206,6 +562,7 @@ def db_list(db_name):
     conn.commit()
               
     conn.close()
+    progress.finish(progress.file_size(db_name))
     print('Database created')
       
     return
@@ -219,17 +576,40 @@ def csv_list(csv_name):
     global dict_artists
 
     print('Creating CSV file "' + csv_name + '"...')
+    progress.start('csv', count_tracks())
     with open(csv_name, 'w', encoding='utf-8', newline='') as csvfile:
-        spamwriter = csv.writer(csvfile)
-        for k_artist in sorted(dict_artists.keys()):
-            for  k_album in sorted(dict_artists[k_artist].keys()):
-                for track in sorted(dict_artists[k_artist][k_album]):
+        spamwriter = csv.writer(progress.output(csvfile))
+        for k_artist, artist_albums in music_view():
+            for k_album, album_tracks in artist_albums:
+                progress.add(rows=len(album_tracks))
+                for track in album_tracks:
                     spamwriter.writerow([k_artist, k_album, track])
+    progress.finish(progress.file_size(csv_name))
     print('CSV file created')
 
     return
 
 
+def snapshot_list(snap_name):
+    """
+    Create a binary snapshot file with the content of the Mucic list in 'dict_artists'.
+    Snapshot format: header, artists, albums and tracks tables, string pool
+    (see 'snapshot.write_snapshot_file')
+    The snapshot is always sorted by UTF-8 bytes, whatever the sort order,
+    because its lookups are binary searches.
+    """
+    global dict_artists
+
+    print('Creating snapshot file "' + snap_name + '"...')
+    progress.start('snapshot', count_tracks())
+    snapshot.write_snapshot_file(snap_name, dict_artists)
+    progress.add(rows=count_tracks())
+    progress.finish(progress.file_size(snap_name))
+    print('Snapshot file created')
+
+    return
+
+
 def json_list_music(json_name):
     """
     Create a JSON (Music List) file with the content of the Mucic list in 'dict_artists'.
@@ -261,25 +641,28 @@ def json_list_music(json_name):
     global dict_artists
 
     print('Creating JSON (Music List) file "' + json_name + '"...')
+    progress.start('json', count_tracks())
     data = {}
     data['format'] = "music-list"
     data['music'] = []
 
     artists = {}
     artists['artists'] = []
-    for k_artist in sorted(dict_artists.keys()):
+    for k_artist, artist_albums in music_view():
         albums = {}
         albums['albums'] = []
-        for  k_album in sorted(dict_artists[k_artist].keys()):
+        for k_album, album_tracks in artist_albums:
             tracks = {}
             tracks['tracks'] = []
-            for track in sorted(dict_artists[k_artist][k_album]):
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 tracks['tracks'].append({'title': track})
             albums['albums'].append({'title': k_album, 'tracks': tracks['tracks']})
         artists['artists'].append({'name': k_artist, 'albums': albums['albums']})
         data['music'].append({'artists': artists['artists']})
 
     write_json_file(json_name, data)
+    progress.finish(progress.file_size(json_name))
     print('JSON (Music List) file created')
 
     return
@@ -308,18 +691,21 @@ def json_list_tracks(json_name):
     global dict_artists
 
     print('Creating JSON (Tracks List) file "' + json_name + '"...')
+    progress.start('json2', count_tracks())
     data = {}
     data['format'] = "tracks-list"
     data['music'] = []  
-    for k_artist in sorted(dict_artists.keys()):
-        for  k_album in sorted(dict_artists[k_artist].keys()):
-            for track in sorted(dict_artists[k_artist][k_album]):
+    for k_artist, artist_albums in music_view():
+        for k_album, album_tracks in artist_albums:
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 data['music'].append({  
                     'artist': k_artist,
                     'album': k_album,
                     'track': track})
 
     write_json_file(json_name, data)
+    progress.finish(progress.file_size(json_name))
     print('JSON (Tracks List) file created')
 
     return
@@ -341,15 +727,18 @@ def xml_list_music(xml_name):
     global dict_artists
 
     print('Creating (Music List) XML file "' + xml_name + '"...')
+    progress.start('xml', count_tracks())
     music = ET.Element("music", {'format': 'music-list'})
-    for k_artist in sorted(dict_artists.keys()):
+    for k_artist, artist_albums in music_view():
         artist = ET.SubElement(music, "artist", {'name': k_artist})
-        for  k_album in sorted(dict_artists[k_artist].keys()):
+        for k_album, album_tracks in artist_albums:
             album = ET.SubElement(artist, "album", {'title': k_album})
-            for track in sorted(dict_artists[k_artist][k_album]):
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 ET.SubElement(album, "track").text = track
 
     write_xml_file(xml_name, music)
+    progress.finish(progress.file_size(xml_name))
     print('XML (Music List) file created')
 
     return
@@ -375,16 +764,19 @@ def xml_list_tracks(xml_name):
     global dict_artists
 
     print('Creating XML (Tracks List) file "' + xml_name + '"...')
+    progress.start('xml2', count_tracks())
     music = ET.Element("music", {'format': 'tracks-list'})
-    for k_artist in sorted(dict_artists.keys()):
-        for  k_album in sorted(dict_artists[k_artist].keys()):
-            for track in sorted(dict_artists[k_artist][k_album]):
+    for k_artist, artist_albums in music_view():
+        for k_album, album_tracks in artist_albums:
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 item = ET.SubElement(music, "item")
                 ET.SubElement(item, "artist").text = k_artist
                 ET.SubElement(item, "album").text = k_album
                 ET.SubElement(item, "track").text = track
 
     write_xml_file(xml_name, music)
+    progress.finish(progress.file_size(xml_name))
     print('XML (Tracks List) file created')
 
     return
@@ -412,6 +804,7 @@ def html_list(html_name):
     global dict_artists
 
     print('Creating HTML file "' + html_name + '"...')
+    progress.start('html', count_tracks())
     page = ET.Element('html')
     head = ET.SubElement(page, 'head')
     ET.SubElement(head, 'meta', {'charset': "UTF-8"})
@@ -419,15 +812,235 @@ def html_list(html_name):
     body = ET.SubElement(page, 'body')
     ET.SubElement(body, 'h1').text = 'MUSIC LIST'
     
-    for k_artist in sorted(dict_artists.keys()):
+    for k_artist, artist_albums in music_view():
         ET.SubElement(body, 'h2').text = k_artist
-        for  k_album in sorted(dict_artists[k_artist].keys()):
+        for k_album, album_tracks in artist_albums:
             ET.SubElement(body, 'h3').text = k_album
             ul = ET.SubElement(body, 'ul')
-            for track in sorted(dict_artists[k_artist][k_album]):
+            progress.add(rows=len(album_tracks))
+            for track in album_tracks:
                 ET.SubElement(ul, "li").text = track
     
     write_html_file(html_name, page)
+    progress.finish(progress.file_size(html_name))
     print('HTML file created')
 
     return
+
+
+def ascii_name(name):
+    """
+    Return a name in lower case without accents.
+    """
+    return unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def slug_name(name):
+    """
+    Return a file system safe and unique name for a page of an artist or an album.
+    """
+    slug = re.sub(r'[^0-9a-z]+', '-', ascii_name(name)).strip('-')[:40]
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+    return (slug + '-' + digest) if slug else digest
+
+
+def shard_name(artist):
+    """
+    Return the alphabetical shard of an artist: 'a' to 'z', or '0' for the rest.
+    """
+    initial = ascii_name(artist[:1])
+    if 'a' <= initial <= 'z':
+        return initial
+    return '0'
+
+
+def html_page(title):
+    """
+    Create the skeleton of an HTML page.
+    Return the page and its body.
+    """
+    page = ET.Element('html')
+    head = ET.SubElement(page, 'head')
+    ET.SubElement(head, 'meta', {'charset': "UTF-8"})
+    ET.SubElement(head, 'title').text = title
+    body = ET.SubElement(page, 'body')
+    ET.SubElement(body, 'h1').text = title
+    return page, body
+
+
+def artist_digest(artist_albums, album_pages):
+    """
+    Return the digest of the content of an artist, used for the incremental build of the site.
+    """
+    content = [SITE_VERSION, album_pages, collation, artist_albums]
+    return hashlib.sha1(json.dumps(content).encode('utf-8')).hexdigest()
+
+
+def write_artist_site(args):
+    """
+    Create the pages of one artist in the site: the artist page and,
+    optionally, one page per album.
+    It runs in a worker process.
+    """
+    site_dir, k_artist, artist_albums, album_pages = args
+
+    artist_slug = slug_name(k_artist)
+    page, body = html_page(k_artist)
+    ET.SubElement(ET.SubElement(body, 'p'), 'a', {'href': '../index-' + shard_name(k_artist) + '.html'}).text = 'Back'
+    for k_album, album_tracks in artist_albums:
+        if album_pages:
+            album_href = artist_slug + '/' + slug_name(k_album) + '.html'
+            ET.SubElement(ET.SubElement(body, 'h3'), 'a', {'href': album_href}).text = k_album
+        else:
+            ET.SubElement(body, 'h3').text = k_album
+        ul = ET.SubElement(body, 'ul')
+        for track in album_tracks:
+            ET.SubElement(ul, "li").text = track
+    write_html_file(os.path.join(site_dir, 'artists', artist_slug + '.html'), page)
+
+    if album_pages:
+        album_dir = os.path.join(site_dir, 'artists', artist_slug)
+        os.makedirs(album_dir, exist_ok=True)
+        for k_album, album_tracks in artist_albums:
+            page, body = html_page(k_album)
+            ET.SubElement(ET.SubElement(body, 'p'), 'a', {'href': '../' + artist_slug + '.html'}).text = k_artist
+            ul = ET.SubElement(body, 'ul')
+            for track in album_tracks:
+                ET.SubElement(ul, "li").text = track
+            write_html_file(os.path.join(album_dir, slug_name(k_album) + '.html'), page)
+
+    return k_artist
+
+
+def remove_artist_site(site_dir, k_artist):
+    """
+    Remove the pages of an artist from the site.
+    """
+    artist_slug = slug_name(k_artist)
+    artist_page = os.path.join(site_dir, 'artists', artist_slug + '.html')
+    if os.path.exists(artist_page):
+        os.remove(artist_page)
+    album_dir = os.path.join(site_dir, 'artists', artist_slug)
+    if os.path.isdir(album_dir):
+        for album_page in os.listdir(album_dir):
+            os.remove(os.path.join(album_dir, album_page))
+        os.rmdir(album_dir)
+    return
+
+
+def site_list(site_dir, album_pages=False, workers=None):
+    """
+    Create a static HTML site with the content of the Mucic list in 'dict_artists'.
+    The pages of the artists are created in parallel worker processes and
+    only the artists changed since the last build are created again.
+    Site format:
+      site/
+      ├── index.html              Links to the alphabetical shards
+      ├── index-a.html            Artists starting with 'a' ('0' for the rest)
+      ├── search.json             Search index for client-side lookup
+      ├── manifest.json           Digest of every artist, for incremental builds
+      └── artists/
+          ├── <artist>.html       Albums and tracks of an artist
+          └── <artist>/
+              └── <album>.html    Tracks of an album (optional)
+    Search index format:
+      {
+          "format": "search-index",
+          "artists": [["author-1", "artists/author-1.html"]],
+          "albums": [["album-1_1", 0]],
+          "tracks": [["track_1_1_1", 0], ["track_1_1_2", 0]]
+      }
+      Albums point to their artist, and tracks to their album, by position.
+      With one page per album, every album also has the link to its page:
+          "albums": [["album-1_1", 0, "artists/author-1/album-1_1.html"]]
+    """
+    global dict_artists
+
+    if workers is not None and workers < 1:
+        raise ValueError('Number of workers must be at least 1')
+
+    print('Creating HTML site "' + site_dir + '"...')
+    os.makedirs(os.path.join(site_dir, 'artists'), exist_ok=True)
+
+    # Read the manifest of the last build
+    manifest_name = os.path.join(site_dir, 'manifest.json')
+    old_manifest = {}
+    if os.path.exists(manifest_name):
+        try:
+            with open(manifest_name, 'r', encoding='utf-8') as manifest_file:
+                old_manifest = json.load(manifest_file)
+        except ValueError:
+            print('Manifest file is not valid, creating the whole site again')
+        if not isinstance(old_manifest, dict):
+            old_manifest = {}
+
+    # Find the artists changed since the last build
+    manifest = {}
+    changed = []
+    for k_artist, artist_albums in music_view():
+        manifest[k_artist] = artist_digest(artist_albums, album_pages)
+        if old_manifest.get(k_artist) != manifest[k_artist]:
+            changed.append((k_artist, artist_albums))
+    for k_artist in old_manifest:
+        if old_manifest[k_artist] != manifest.get(k_artist):
+            remove_artist_site(site_dir, k_artist)
+
+    # Create the pages of the changed artists
+    jobs = [(site_dir, k_artist, artist_albums, album_pages) for k_artist, artist_albums in changed]
+    progress.start('site', sum(len(album_tracks) for job in jobs for _, album_tracks in job[2]))
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for k_artist in executor.map(write_artist_site, jobs, chunksize=max(1, len(jobs) // 64)):
+                progress.add(rows=sum(len(list_tracks) for list_tracks in dict_artists[k_artist].values()))
+    else:
+        for job in jobs:
+            write_artist_site(job)
+            progress.add(rows=sum(len(album_tracks) for _, album_tracks in job[2]))
+    progress.finish()
+
+    # Create the alphabetical shards, the index and the search index
+    shards = {}
+    search = {'format': 'search-index', 'artists': [], 'albums': [], 'tracks': []}
+    for k_artist, artist_albums in music_view():
+        shards.setdefault(shard_name(k_artist), []).append(k_artist)
+        artist_slug = slug_name(k_artist)
+        search['artists'].append([k_artist, 'artists/' + artist_slug + '.html'])
+        for k_album, album_tracks in artist_albums:
+            album_entry = [k_album, len(search['artists']) - 1]
+            if album_pages:
+                album_entry.append('artists/' + artist_slug + '/' + slug_name(k_album) + '.html')
+            search['albums'].append(album_entry)
+            for track in album_tracks:
+                search['tracks'].append([track, len(search['albums']) - 1])
+
+    page, body = html_page('MUSIC LIST')
+    ul = ET.SubElement(body, 'ul')
+    for shard in sorted(shards.keys()):
+        ET.SubElement(ET.SubElement(ul, 'li'), 'a', {'href': 'index-' + shard + '.html'}).text = \
+            shard.upper() + ' (' + str(len(shards[shard])) + ')'
+    write_html_file(os.path.join(site_dir, 'index.html'), page)
+
+    for old_shard in os.listdir(site_dir):
+        if old_shard.startswith('index-') and old_shard[6:-5] not in shards:
+            os.remove(os.path.join(site_dir, old_shard))
+    for shard in shards:
+        page, body = html_page('MUSIC LIST - ' + shard.upper())
+        ET.SubElement(ET.SubElement(body, 'p'), 'a', {'href': 'index.html'}).text = 'Index'
+        ul = ET.SubElement(body, 'ul')
+        for k_artist in shards[shard]:
+            ET.SubElement(ET.SubElement(ul, 'li'), 'a', {'href': 'artists/' + slug_name(k_artist) + '.html'}).text = k_artist
+        write_html_file(os.path.join(site_dir, 'index-' + shard + '.html'), page)
+
+    with open(os.path.join(site_dir, 'search.json'), 'w', encoding='utf-8') as json_file:
+        json.dump(search, json_file, ensure_ascii=False, separators=(',', ':'))
+
+    # Save the manifest at the end, so an interrupted build is done again.
+    # The file is replaced at once, so it is never read half written.
+    temp_name = manifest_name + '.tmp'
+    with open(temp_name, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temp_name, manifest_name)
+
+    print('HTML site created (' + str(len(changed)) + ' of ' + str(len(manifest)) + ' artists updated)')
+
+    return
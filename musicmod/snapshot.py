@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# snapshot.py
+# Module of musiclist.py
+# Functions that write and read the binary snapshot of a Music list.
+
+import mmap
+import struct
+import zlib
+
+SNAPSHOT_MAGIC = b'MLSN'     # First bytes of a snapshot file
+SNAPSHOT_VERSION = 1         # Version of the snapshot format
+
+# Header: magic, version, flags, number of artists, albums and tracks,
+# size of the string pool and CRC-32 of everything after the header
+HEADER = struct.Struct('<4sHHIIIII')
+# Artist and album: name offset, name length, first child, number of children
+NODE = struct.Struct('<IIII')
+# Track: name offset, name length
+LEAF = struct.Struct('<II')
+
+
+def write_snapshot_file(snap_name, dict_artists):
+    """
+    Create and write a binary snapshot file of a Music list.
+    Snapshot format:
+      header          magic 'MLSN', version, counts, pool size, checksum
+      artists table   one NODE per artist, sorted by name
+      albums table    one NODE per album, grouped by artist and sorted by name
+      tracks table    one LEAF per track, grouped by album and sorted by name
+      string pool     UTF-8 names, each repeated name is stored once
+    Names are sorted by their UTF-8 bytes, the same order as Python strings,
+    so a name can be searched in the tables without decoding them.
+    """
+    pool = bytearray()
+    pool_offsets = {}
+
+    def add_name(name):
+        if name not in pool_offsets:
+            data = name.encode('utf-8')
+            pool_offsets[name] = (len(pool), len(data))
+            pool.extend(data)
+        return pool_offsets[name]
+
+    artists = bytearray()
+    albums = bytearray()
+    tracks = bytearray()
+    n_albums = n_tracks = 0
+    for k_artist in sorted(dict_artists.keys()):
+        artist_albums = dict_artists[k_artist]
+        artists.extend(NODE.pack(*add_name(k_artist), n_albums, len(artist_albums)))
+        for k_album in sorted(artist_albums.keys()):
+            album_tracks = artist_albums[k_album]
+            albums.extend(NODE.pack(*add_name(k_album), n_tracks, len(album_tracks)))
+            for track in sorted(album_tracks):
+                tracks.extend(LEAF.pack(*add_name(track)))
+            n_tracks += len(album_tracks)
+        n_albums += len(artist_albums)
+
+    checksum = 0
+    for part in (artists, albums, tracks, pool):
+        checksum = zlib.crc32(part, checksum)
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0,
+                         len(dict_artists), n_albums, n_tracks, len(pool), checksum)
+    with open(snap_name, 'wb') as f:
+        for part in (header, artists, albums, tracks, pool):
+            f.write(part)
+    return
+
+
+class MusicSnapshot:
+    """
+    Read a binary snapshot file of a Music list.
+    The file is opened with mmap, so the tables are used in place:
+    nothing is parsed when it is opened and only the names that are
+    returned are decoded.
+    Raise ValueError if the file is not a valid snapshot file.
+    """
+    def __init__(self, snap_name, verify=True):
+        with open(snap_name, 'rb') as f:
+            if f.seek(0, 2) < HEADER.size:
+                raise ValueError('File too short for a music snapshot')
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.n_artists, self.n_albums, self.n_tracks, pool_size, checksum = \
+                HEADER.unpack_from(self.mm, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError('File is not a music snapshot')
+            if version != SNAPSHOT_VERSION:
+                raise ValueError('Music snapshot version ' + str(version) + ' is not supported')
+            self.artists_offset = HEADER.size
+            self.albums_offset = self.artists_offset + self.n_artists * NODE.size
+            self.tracks_offset = self.albums_offset + self.n_albums * NODE.size
+            self.pool_offset = self.tracks_offset + self.n_tracks * LEAF.size
+            if self.pool_offset + pool_size != len(self.mm):
+                raise ValueError('Music snapshot has a wrong size')
+            if verify and zlib.crc32(memoryview(self.mm)[HEADER.size:]) != checksum:
+                raise ValueError('Music snapshot checksum does not match')
+        except ValueError:
+            self.mm.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.mm.close()
+
+    def name(self, offset, length):
+        start = self.pool_offset + offset
+        return self.mm[start:start + length].decode('utf-8')
+
+    def artist(self, i):
+        # Return (name offset, name length, first album, number of albums)
+        return NODE.unpack_from(self.mm, self.artists_offset + i * NODE.size)
+
+    def album(self, i):
+        # Return (name offset, name length, first track, number of tracks)
+        return NODE.unpack_from(self.mm, self.albums_offset + i * NODE.size)
+
+    def track(self, i):
+        # Return (name offset, name length)
+        return LEAF.unpack_from(self.mm, self.tracks_offset + i * LEAF.size)
+
+    def search(self, name, first, count, node):
+        # Binary search of a name in a sorted range of a table
+        key = name.encode('utf-8')
+        lo, hi = first, first + count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length = node(mid)[:2]
+            start = self.pool_offset + offset
+            data = self.mm[start:start + length]
+            if data == key:
+                return mid
+            if data < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return -1
+
+    def find_artist(self, k_artist):
+        """
+        Return the position of an artist, or -1 if it does not exist.
+        """
+        return self.search(k_artist, 0, self.n_artists, self.artist)
+
+    def find_album(self, k_artist, k_album):
+        """
+        Return the position of an album of an artist, or -1 if it does not exist.
+        """
+        i = self.find_artist(k_artist)
+        if i < 0:
+            return -1
+        _, _, first, count = self.artist(i)
+        return self.search(k_album, first, count, self.album)
+
+    def artists(self):
+        """
+        Iterate the names of the artists.
+        """
+        for i in range(self.n_artists):
+            yield self.name(*self.artist(i)[:2])
+
+    def albums(self, k_artist):
+        """
+        Iterate the names of the albums of an artist.
+        """
+        i = self.find_artist(k_artist)
+        if i >= 0:
+            _, _, first, count = self.artist(i)
+            for j in range(first, first + count):
+                yield self.name(*self.album(j)[:2])
+
+    def tracks(self, k_artist, k_album):
+        """
+        Iterate the names of the tracks of an album.
+        """
+        j = self.find_album(k_artist, k_album)
+        if j >= 0:
+            _, _, first, count = self.album(j)
+            for k in range(first, first + count):
+                yield self.name(*self.track(k))
+
+    def items(self):
+        """
+        Iterate all the tracks as (artist, album, track).
+        """
+        for i in range(self.n_artists):
+            offset, length, first_album, n_albums = self.artist(i)
+            k_artist = self.name(offset, length)
+            for j in range(first_album, first_album + n_albums):
+                offset, length, first_track, n_tracks = self.album(j)
+                k_album = self.name(offset, length)
+                for k in range(first_track, first_track + n_tracks):
+                    yield k_artist, k_album, self.name(*self.track(k))
+
+    def to_dict(self):
+        """
+        Return the Music list with the structure of 'dict_artists'.
+        Albums without tracks are kept.
+        """
+        music = {}
+        for i in range(self.n_artists):
+            offset, length, first_album, n_albums = self.artist(i)
+            dict_albums = music[self.name(offset, length)] = {}
+            for j in range(first_album, first_album + n_albums):
+                offset, length, first_track, n_tracks = self.album(j)
+                dict_albums[self.name(offset, length)] = \
+                    [self.name(*self.track(k)) for k in range(first_track, first_track + n_tracks)]
+        return music
@@ -11,6 +11,7 @@ import csv
 import json
 import xml.etree.ElementTree as ET
 from html.parser import HTMLParser
+from musicmod import snapshot
 
 
 def encode_decode_screen(unicode_str):
@@ -63,6 +64,26 @@ def csv_list(csv_name):
     return
 
 
+def snapshot_list(snap_name):
+    """
+    Show the content of a binary snapshot file that contains a Mucic list.
+    The file is memory-mapped, so the rows are read without parsing the file.
+    """
+    if os.path.exists(snap_name):
+        try:
+            with snapshot.MusicSnapshot(snap_name) as snap:
+                for row in snap.items():
+                    print(encode_decode_screen(row[0]) + "   |   " +\
+                          encode_decode_screen(row[1]) + "   |   " +\
+                          encode_decode_screen(row[2]))
+        except ValueError as e:
+            print('Snapshot file does not match a music snapshot file: ' + str(e))
+    else:
+        print('Snapshot file does not exist')
+
+    return
+
+
 def json_list(json_name):
     """
     Show the content of a JSON file that contains a Mucic list.